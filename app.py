@@ -1,20 +1,42 @@
+import gzip
+import hashlib
+import json
+import mmap
 import os
+import pickle
 import random
+import threading
+from collections import deque
+from itertools import count, islice
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
+from functools import lru_cache
 
-from flask import Flask, jsonify, render_template, abort, request
+from flask import Flask, Response, jsonify, render_template, abort, request
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 
+# Optional: orjson encodes JSON (floats especially) several times faster
+# than the stdlib encoder Flask uses by default.
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 # ---------------------------------------------------------------------------
 # Optional geospatial libraries (GeoPandas + Shapely)
 # ---------------------------------------------------------------------------
 try:
     import geopandas as gpd
-    from shapely.geometry import Point, MultiPolygon
-    from shapely.errors import GEOSException
+    import numpy as np
+    import pyproj
+    import shapely
+    from shapely.geometry import MultiPolygon
 
     GEOPANDAS_AVAILABLE = True
     EMPTY_GEOMETRY = MultiPolygon()
+    _RNG = np.random.default_rng()
     print("GeoPandas and Shapely loaded successfully.")
 except ImportError:
     GEOPANDAS_AVAILABLE = False
@@ -24,8 +46,7 @@ except ImportError:
           "Install with:  pip install geopandas shapely fiona pyproj rtree")
     print("***************************************************************\n")
 
-    # Dummy fall‑backs so code keeps running without GeoPandas
-    Point = lambda *args, **kwargs: None               # type: ignore
+    # Dummy fall‑back so code keeps running without GeoPandas
     class _DummyGeom:                                  # type: ignore
         def contains(self, *_): return False
         @property
@@ -34,6 +55,14 @@ except ImportError:
         def union_all(self): return self
     EMPTY_GEOMETRY = _DummyGeom()                      # type: ignore
 
+# Optional: pyogrio reads shapefiles straight into WKB arrays in C, skipping
+# the per-feature iteration (and the GeoDataFrame we never use anyway).
+try:
+    from pyogrio.raw import read as pyogrio_read_raw
+    PYOGRIO_AVAILABLE = GEOPANDAS_AVAILABLE
+except ImportError:
+    PYOGRIO_AVAILABLE = False
+
 # ---------------------------------------------------------------------------
 # Configuration – add / edit country blocks here
 # ---------------------------------------------------------------------------
@@ -77,17 +106,44 @@ COUNTRY_CONFIG = {
 SHAPEFILES_BASE_FOLDER = "shapefiles"
 WGS84_CRS               = "EPSG:4326"
 NUM_BOATS_PER_COUNTRY   = 50
+SAMPLE_BATCH_SIZE       = 4096   # candidates per vectorized sampling round
+MAX_SAMPLE_ROUNDS       = 50
+SIMPLIFY_TOLERANCE_DEG  = 1e-4   # ~10 m – applied before caching the union
+GRID_CELLS_PER_AXIS     = 64     # resolution of the uniform grid index
 
 # ---------------------------------------------------------------------------
 # In‑memory store
 # ---------------------------------------------------------------------------
 APP_DATA = {
     "boats":             {},   # {country_code: [boat, …]}
-    "history":           [],   # list of valve‑opening log entries
+    "boat_index":        {},   # {boat_id: (country_code, boat dict)}
+    "history":           deque(),  # valve‑opening log entries, kept newest‑first
     "buffer_geometries": {},   # {country_code: geometry}
     "land_geometries":   {},   # {country_code: geometry}
+    "sampling_zones":    {},   # {country_code: clipped sampling domains or None}
+    "buffer_grids":      {},   # {country_code: uniform grid index or None}
+    "land_grids":        {},   # {country_code: uniform grid index or None}
+    "buffer_bounds":     {},   # {country_code: (minx, miny, maxx, maxy) or None}
+    "land_bounds":       {},   # {country_code: (minx, miny, maxx, maxy) or None}
+    "buffer_geojson":    {},   # {country_code: GeoJSON string or None}
+    "land_geojson":      {},   # {country_code: GeoJSON string or None}
+    "mapdata_static":    {},   # {country_code: pre-encoded static JSON fragment}
+    "mapdata_gzip":      {},   # {country_code: (gzipped body, ETag)}
 }
-NEXT_BOAT_ID = 301
+# Monotonic boat-id source – next(_ID_ITER) is atomic in CPython, so id
+# draws need no lock; load_or_generate_boats rebinds it past pickled fleets.
+_ID_ITER = count(301)
+
+# One lock per shapefile so concurrent cache misses (e.g. parallel pre-load)
+# don't trigger duplicate loads, while a country's buffer and land files can
+# still load simultaneously.
+_GEOMETRY_LOCKS = {(kind, code): threading.Lock()
+                   for code in COUNTRY_CONFIG for kind in ("buffer", "land")}
+
+# Guards the mutable request-path state (valve flips, id-iterator rebinds)
+# so the app stays correct under gevent/threaded workers, where handlers can
+# interleave mid-function.
+_STATE_LOCK = threading.Lock()
 
 # ---------------------------------------------------------------------------
 # Flask setup
@@ -95,6 +151,17 @@ NEXT_BOAT_ID = 301
 app = Flask(__name__)
 CORS(app)
 
+if ORJSON_AVAILABLE:
+    class _OrjsonProvider(DefaultJSONProvider):
+        """Route jsonify() through orjson's C encoder."""
+        def dumps(self, obj, **kwargs):
+            return orjson.dumps(obj).decode()
+
+        def loads(self, s, **kwargs):
+            return orjson.loads(s)
+
+    app.json = _OrjsonProvider(app)
+
 # ---------------------------------------------------------------------------
 # Helper – file paths
 # ---------------------------------------------------------------------------
@@ -107,89 +174,393 @@ def get_country_folder(code: str) -> str:
 # ---------------------------------------------------------------------------
 # Helpers – load geometries (cached)
 # ---------------------------------------------------------------------------
-def _load_geometry(path: str, assume_wgs84_msg: str):
+def _reproject_to_wgs84(geom, src_crs):
+    """
+    Reproject one geometry to WGS84 by transforming its flat coordinate
+    array in a single vectorized pyproj call, rather than per-vertex through
+    GEOS callbacks.
+    """
+    transformer = pyproj.Transformer.from_crs(src_crs, WGS84_CRS,
+                                              always_xy=True)
+    coords = shapely.get_coordinates(geom)
+    xs, ys = transformer.transform(coords[:, 0], coords[:, 1])
+    return shapely.set_coordinates(geom, np.column_stack([xs, ys]))
+
+def _read_union_pyogrio(path: str, assume_wgs84_msg: str):
     """
-    Internal helper: read a shapefile, re‑project to WGS84, return GeoSeries.
+    Fast shapefile read: pyogrio returns raw WKB (no attribute columns, no
+    GeoDataFrame), which shapely decodes into a geometry array in one call.
     """
-    gdf = gpd.read_file(path)
-    if gdf.crs and gdf.crs != WGS84_CRS:
-        gdf = gdf.to_crs(WGS84_CRS)
-    elif not gdf.crs:
+    meta, _, wkb_geoms, _ = pyogrio_read_raw(path, columns=[],
+                                             read_geometry=True)
+    geoms = shapely.from_wkb(wkb_geoms)
+    # make_valid repairs in one vectorized pass instead of a validity scan
+    # plus a throwaway buffer(0) polygon per feature; nothing gets dropped.
+    union = shapely.union_all(shapely.make_valid(geoms))
+
+    src_crs = meta.get("crs")
+    if not src_crs:
         print(assume_wgs84_msg)
-        gdf.set_crs(WGS84_CRS, inplace=True)
-    return gdf[gdf.geometry.is_valid].geometry.buffer(0).union_all()
+    elif pyproj.CRS(src_crs) != pyproj.CRS(WGS84_CRS):
+        union = _reproject_to_wgs84(union, src_crs)
+    return union
+
+def _load_geometry(path: str, assume_wgs84_msg: str):
+    """
+    Internal helper: read a shapefile, re‑project to WGS84 and return the
+    unioned geometry.  The union serves GeoJSON export, the grid/bbox
+    builders and the contains_xy point checks.
+
+    The cleaned, simplified union is cached as a WKB sidecar next to the
+    shapefile, so repeat startups (including Flask debug reloads) skip the
+    read / reproject / union work entirely.
+    """
+    # Tolerance is baked into the cache name so retuning
+    # SIMPLIFY_TOLERANCE_DEG invalidates old sidecars instead of silently
+    # serving a union simplified with the previous setting.
+    cache_path = f"{path}.union.tol{SIMPLIFY_TOLERANCE_DEG:g}.wkb"
+    if (os.path.exists(cache_path)
+            and os.path.getmtime(cache_path) >= os.path.getmtime(path)):
+        # mmap the cache read-only: when several server workers load the
+        # same country, the WKB pages are shared through the OS page cache
+        # instead of each worker doing its own buffered read.
+        with open(cache_path, "rb") as fh:
+            with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                union = shapely.from_wkb(bytes(mm))
+    else:
+        if PYOGRIO_AVAILABLE:
+            union = _read_union_pyogrio(path, assume_wgs84_msg)
+        else:
+            gdf = gpd.read_file(path)
+            if gdf.crs and gdf.crs != WGS84_CRS:
+                gdf = gdf.to_crs(WGS84_CRS)
+            elif not gdf.crs:
+                print(assume_wgs84_msg)
+                gdf.set_crs(WGS84_CRS, inplace=True)
+            union = shapely.union_all(shapely.make_valid(gdf.geometry.values))
+        union = union.simplify(SIMPLIFY_TOLERANCE_DEG, preserve_topology=True)
+        try:
+            with open(cache_path, "wb") as fh:
+                fh.write(shapely.to_wkb(union))
+        except OSError as e:
+            print(f"[WARN] Could not write geometry cache {cache_path}: {e}")
+    if not union.is_empty:
+        # Prepare once at load: every later contains_xy / predicate call on
+        # the union hits the GEOS prepared-geometry edge index.
+        shapely.prepare(union)
+    return union
+
+def _build_grid_index(union):
+    """
+    Coarse uniform grid over the geometry's bounds (dead-space pruning).
+    Cells fully inside the geometry answer contains-checks in O(1), cells
+    that don't touch it reject immediately, and only the 'mixed' boundary
+    cells fall through to a precise test.
 
+    Returns (full_inside, mixed, minx, miny, dx, dy) or None if degenerate.
+    """
+    minx, miny, maxx, maxy = union.bounds
+    n  = GRID_CELLS_PER_AXIS
+    dx = (maxx - minx) / n
+    dy = (maxy - miny) / n
+    if dx <= 0 or dy <= 0:
+        return None
+
+    cell_x0 = np.repeat(minx + dx * np.arange(n), n)
+    cell_y0 = np.tile(miny + dy * np.arange(n), n)
+    cells   = shapely.box(cell_x0, cell_y0, cell_x0 + dx, cell_y0 + dy)
+
+    full_inside = shapely.contains_properly(union, cells).reshape(n, n)
+    mixed       = shapely.intersects(union, cells).reshape(n, n) & ~full_inside
+    return full_inside, mixed, minx, miny, dx, dy
+
+def _grid_lookup(grid, lat, lng):
+    """True/False when the grid can decide, None when a precise test is needed."""
+    full_inside, mixed, minx, miny, dx, dy = grid
+    i = int((lng - minx) / dx)
+    j = int((lat - miny) / dy)
+    if not (0 <= i < GRID_CELLS_PER_AXIS and 0 <= j < GRID_CELLS_PER_AXIS):
+        return False
+    if full_inside[i, j]:
+        return True
+    if not mixed[i, j]:
+        return False
+    return None
+
+def _geometry_to_geojson(geom):
+    """Serialize a geometry for map display (None if empty/unavailable)."""
+    if geom.is_empty:
+        return None
+    # Straight GEOS-to-JSON in C, wrapped as a single-feature collection so
+    # the payload shape matches what GeoSeries.to_json used to produce.
+    return ('{"type":"FeatureCollection","features":[{"type":"Feature",'
+            '"properties":{},"geometry":' + shapely.to_geojson(geom) + '}]}')
+
+@lru_cache(maxsize=None)
 def get_buffer_geometry(code: str):
+    # lru_cache gives repeat calls a C-level fast path; APP_DATA keeps the
+    # per-kind caches (tree/bounds/geojson/grid) for the other accessors.
     if not GEOPANDAS_AVAILABLE:           return EMPTY_GEOMETRY
     if code in APP_DATA["buffer_geometries"]:
         return APP_DATA["buffer_geometries"][code]
 
-    config     = COUNTRY_CONFIG[code]
-    country_fp = get_country_folder(code)
-    shp_path   = os.path.join(country_fp, config["buffer_shp"])
-    if not os.path.exists(shp_path):
-        print(f"[WARN] Buffer file not found: {shp_path}")
-        APP_DATA["buffer_geometries"][code] = EMPTY_GEOMETRY
-        return EMPTY_GEOMETRY
-
-    geom = _load_geometry(
-        shp_path, f"[WARN] Buffer CRS undefined for {code}. Assuming WGS84."
-    )
-    APP_DATA["buffer_geometries"][code] = geom
-    return geom
-
+    with _GEOMETRY_LOCKS["buffer", code]:
+        if code in APP_DATA["buffer_geometries"]:   # re-check under the lock
+            return APP_DATA["buffer_geometries"][code]
+
+        config     = COUNTRY_CONFIG[code]
+        country_fp = get_country_folder(code)
+        shp_path   = os.path.join(country_fp, config["buffer_shp"])
+        if not os.path.exists(shp_path):
+            print(f"[WARN] Buffer file not found: {shp_path}")
+            APP_DATA["buffer_bounds"][code]     = None
+            APP_DATA["buffer_geojson"][code]    = None
+            APP_DATA["buffer_grids"][code]      = None
+            APP_DATA["buffer_geometries"][code] = EMPTY_GEOMETRY
+            return EMPTY_GEOMETRY
+
+        geom = _load_geometry(
+            shp_path, f"[WARN] Buffer CRS undefined for {code}. Assuming WGS84."
+        )
+        APP_DATA["buffer_bounds"][code]     = geom.bounds if not geom.is_empty else None
+        APP_DATA["buffer_geojson"][code]    = _geometry_to_geojson(geom)
+        APP_DATA["buffer_grids"][code]      = (_build_grid_index(geom)
+                                               if not geom.is_empty else None)
+        APP_DATA["buffer_geometries"][code] = geom
+        return geom
+
+@lru_cache(maxsize=None)
 def get_land_geometry(code: str):
     if not GEOPANDAS_AVAILABLE:           return EMPTY_GEOMETRY
     if code in APP_DATA["land_geometries"]:
         return APP_DATA["land_geometries"][code]
 
-    config     = COUNTRY_CONFIG[code]
-    country_fp = get_country_folder(code)
-    shp_path   = os.path.join(country_fp, config["simplified_land_shp"])
-    if not os.path.exists(shp_path):
-        print(f"[WARN] Land file not found: {shp_path}")
-        APP_DATA["land_geometries"][code] = EMPTY_GEOMETRY
-        return EMPTY_GEOMETRY
+    with _GEOMETRY_LOCKS["land", code]:
+        if code in APP_DATA["land_geometries"]:     # re-check under the lock
+            return APP_DATA["land_geometries"][code]
+
+        config     = COUNTRY_CONFIG[code]
+        country_fp = get_country_folder(code)
+        shp_path   = os.path.join(country_fp, config["simplified_land_shp"])
+        if not os.path.exists(shp_path):
+            print(f"[WARN] Land file not found: {shp_path}")
+            APP_DATA["land_bounds"][code]     = None
+            APP_DATA["land_geojson"][code]    = None
+            APP_DATA["land_grids"][code]      = None
+            APP_DATA["land_geometries"][code] = EMPTY_GEOMETRY
+            return EMPTY_GEOMETRY
+
+        geom = _load_geometry(
+            shp_path, f"[WARN] Land CRS undefined for {code}. Assuming WGS84."
+        )
+        APP_DATA["land_bounds"][code]     = geom.bounds if not geom.is_empty else None
+        APP_DATA["land_geojson"][code]    = _geometry_to_geojson(geom)
+        APP_DATA["land_grids"][code]      = (_build_grid_index(geom)
+                                             if not geom.is_empty else None)
+        APP_DATA["land_geometries"][code] = geom
+        return geom
+
+def get_buffer_bounds(code: str):
+    """(minx, miny, maxx, maxy) of the buffer geometry (None if unavailable)."""
+    get_buffer_geometry(code)                 # ensure cache is populated
+    return APP_DATA["buffer_bounds"].get(code)
+
+def get_land_bounds(code: str):
+    """(minx, miny, maxx, maxy) of the land geometry (None if unavailable)."""
+    get_land_geometry(code)
+    return APP_DATA["land_bounds"].get(code)
+
+def _make_sampling_domain(polys):
+    """Prepare clipped polygons and their area weights / bounds for sampling."""
+    polys = [p for p in polys if not p.is_empty]
+    if not polys:
+        return None
+    for p in polys:
+        shapely.prepare(p)
+    areas  = np.array([p.area for p in polys])
+    bounds = np.array([p.bounds for p in polys])
+    return polys, bounds, areas / areas.sum()
+
+def get_sampling_zones(code: str):
+    """
+    Per-country sampling domains, clipped once from the sea boxes:
 
-    geom = _load_geometry(
-        shp_path, f"[WARN] Land CRS undefined for {code}. Assuming WGS84."
-    )
-    APP_DATA["land_geometries"][code] = geom
-    return geom
+        inside  = box ∩ buffer − land   (where in-zone boats may sit)
+        outside = box − buffer − land   (open-water boats)
+
+    Sampling inside these polygons makes the rejection rate near zero,
+    instead of drawing from the raw boxes and discarding most candidates.
+    Returns (inside_domain, outside_domain) or None when unavailable.
+    """
+    if code in APP_DATA["sampling_zones"]:
+        return APP_DATA["sampling_zones"][code]
+
+    buf_geom  = get_buffer_geometry(code)
+    land_geom = get_land_geometry(code)
+    if buf_geom.is_empty:
+        APP_DATA["sampling_zones"][code] = None
+        return None
+
+    inside_polys, outside_polys = [], []
+    for b in COUNTRY_CONFIG[code]["sea_boxes"]:
+        cell = shapely.box(b["min_lng"], b["min_lat"],
+                           b["max_lng"], b["max_lat"])
+        inside_polys.append(cell.intersection(buf_geom).difference(land_geom))
+        outside_polys.append(cell.difference(buf_geom).difference(land_geom))
+
+    entry = (_make_sampling_domain(inside_polys),
+             _make_sampling_domain(outside_polys))
+    APP_DATA["sampling_zones"][code] = entry
+    return entry
 
 # ---------------------------------------------------------------------------
 # Point‑in‑polygon helpers
 # ---------------------------------------------------------------------------
-def is_in_zone(lat, lng, buf_geom):
-    if not GEOPANDAS_AVAILABLE or buf_geom.is_empty:
-        return False
-    try:            return buf_geom.contains(Point(lng, lat))
-    except Exception as e:
-        print(f"[ERR] zone check: {e}")
+def _make_point_checker(geom, bounds, grid, label):
+    """
+    Build a scalar point-in-geometry closure.  Bounds, grid and geometry are
+    captured as locals, so each call is straight LOAD_FASTs instead of
+    re-fetching the per-country caches through dict lookups.
+    """
+    if bounds is None:
+        return lambda lat, lng: False
+
+    def check(lat, lng):
+        minx, miny, maxx, maxy = bounds
+        if not (minx <= lng <= maxx and miny <= lat <= maxy):
+            return False
+        if grid is not None:
+            decided = _grid_lookup(grid, lat, lng)
+            if decided is not None:
+                return decided
+        try:
+            # contains_xy takes the raw floats – no throwaway Point allocation.
+            return bool(shapely.contains_xy(geom, lng, lat))
+        except Exception as e:
+            print(f"[ERR] {label} check: {e}")
+            return False
+
+    return check
+
+_POINT_CHECKERS = {}   # {("buffer"|"land", code): closure}
+
+def _point_checker(kind, code):
+    checker = _POINT_CHECKERS.get((kind, code))
+    if checker is None:
+        if kind == "buffer":
+            bounds = get_buffer_bounds(code)   # also populates the caches
+            checker = _make_point_checker(APP_DATA["buffer_geometries"][code],
+                                          bounds,
+                                          APP_DATA["buffer_grids"].get(code),
+                                          "zone")
+        else:
+            bounds = get_land_bounds(code)
+            checker = _make_point_checker(APP_DATA["land_geometries"][code],
+                                          bounds,
+                                          APP_DATA["land_grids"].get(code),
+                                          "land")
+        _POINT_CHECKERS[(kind, code)] = checker
+    return checker
+
+def is_in_zone(lat, lng, code):
+    if not GEOPANDAS_AVAILABLE:
         return False
+    return _point_checker("buffer", code)(lat, lng)
 
-def is_on_land(lat, lng, land_geom):
-    if not GEOPANDAS_AVAILABLE or land_geom.is_empty:
-        return False
-    try:            return land_geom.contains(Point(lng, lat))
-    except Exception as e:
-        print(f"[ERR] land check: {e}")
+def is_on_land(lat, lng, code):
+    if not GEOPANDAS_AVAILABLE:
         return False
+    return _point_checker("land", code)(lat, lng)
 
 # ---------------------------------------------------------------------------
 # Boat generator  – **valve closed if inside buffer**
 # ---------------------------------------------------------------------------
+def _random_positions(cfg, count):
+    """Unchecked random positions inside the sea boxes (no-geometry path).
+
+    The box bounds are hoisted into plain tuples once, so the per-boat loop
+    does an index draw and two uniform() calls instead of re-indexing a list
+    of dicts on every attempt.
+    """
+    spans = [(b["min_lat"], b["max_lat"], b["min_lng"], b["max_lng"])
+             for b in cfg["sea_boxes"]]
+    n_spans = len(spans)
+    pts = []
+    for _ in range(count):
+        lo_lat, hi_lat, lo_lng, hi_lng = spans[random.randrange(n_spans)]
+        pts.append((round(random.uniform(lo_lat, hi_lat), 6),
+                    round(random.uniform(lo_lng, hi_lng), 6)))
+    return pts
+
+def _sample_from_domain(domain, target):
+    """Rejection-sample `target` (lat, lng) points inside a clipped domain."""
+    if domain is None:
+        return []
+    polys, bounds, weights = domain
+
+    pts = []
+    for _ in range(MAX_SAMPLE_ROUNDS):
+        if len(pts) >= target:
+            break
+        need  = target - len(pts)
+        batch = min(max(need * 4, 64), SAMPLE_BATCH_SIZE)
+
+        pick = _RNG.choice(len(polys), size=batch, p=weights)
+        bb   = bounds[pick]
+        lngs = bb[:, 0] + _RNG.random(batch) * (bb[:, 2] - bb[:, 0])
+        lats = bb[:, 1] + _RNG.random(batch) * (bb[:, 3] - bb[:, 1])
+
+        ok = np.zeros(batch, dtype=bool)
+        for i in np.unique(pick):
+            sel = pick == i
+            ok[sel] = shapely.contains_xy(polys[i], lngs[sel], lats[sel])
+
+        # Round once in C for the whole batch; the per-boat round() calls
+        # this replaces were a measurable slice of generation time.
+        lats_r = np.round(lats[ok], 6).tolist()
+        lngs_r = np.round(lngs[ok], 6).tolist()
+        for lat, lng in zip(lats_r, lngs_r):
+            if len(pts) < target:
+                pts.append((lat, lng))
+    return pts
+
+def _sample_positions_vectorized(inside_target, outside_target, code):
+    """
+    Draw boat positions from the pre-clipped per-sea-box domains: pick a
+    polygon weighted by area, then batch-sample within its bounds and accept
+    via vectorized contains_xy on the small local polygon instead of testing
+    against the whole coastline.
+
+    Returns two lists of (lat, lng): inside the buffer and outside it
+    (both off land).
+    """
+    domains = get_sampling_zones(code)
+    if domains is None:
+        return [], []
+
+    inside_pts  = _sample_from_domain(domains[0], inside_target)
+    outside_pts = _sample_from_domain(domains[1], outside_target)
+
+    if len(inside_pts) < inside_target or len(outside_pts) < outside_target:
+        print(f"[WARN] Sampling exhausted for '{code}': "
+              f"{len(inside_pts)}/{inside_target} in-zone, "
+              f"{len(outside_pts)}/{outside_target} open-water candidates.")
+
+    return inside_pts, outside_pts
+
 def generate_boats(code, n, buf_geom, land_geom):
-    global NEXT_BOAT_ID
+    # Boats are deliberately kept as a list of dicts rather than
+    # column-oriented arrays: the rows go straight into the JSON response
+    # (the frontend iterates objects), toggle_valve mutates single rows in
+    # place through boat_index, and the heavy per-field work (positions,
+    # names, valve draws) is already vectorized before the rows are built.
     cfg = COUNTRY_CONFIG[code]
 
     inside_target  = round(n * 0.20)
     outside_target = n - inside_target
-    boats_in, boats_out = [], []
 
     # shorten lookups
-    buf_valid  = GEOPANDAS_AVAILABLE and not buf_geom.is_empty
-    land_valid = GEOPANDAS_AVAILABLE and not land_geom.is_empty
+    buf_valid = GEOPANDAS_AVAILABLE and not buf_geom.is_empty
 
     base_names = [
         "Sea Eagle","Adriatic Queen","Dalmatian Dream","Wave Runner","Island Hopper",
@@ -198,52 +569,117 @@ def generate_boats(code, n, buf_geom, land_geom):
         "Buffer Skimmer","Zone Tester","Caribbean Breeze","Grenadine Ghost"
     ]
 
-    # ---- create inside‑buffer boats (valve CLOSED) -------------------------
-    attempts = 0
-    while len(boats_in) < inside_target and attempts < inside_target * 500:
-        attempts += 1
-        box = random.choice(cfg["sea_boxes"])
-        lat = random.uniform(box["min_lat"], box["max_lat"])
-        lng = random.uniform(box["min_lng"], box["max_lng"])
-
-        if buf_valid  and not is_in_zone(lat, lng, buf_geom):  continue
-        if land_valid and     is_on_land(lat, lng, land_geom): continue
-
-        boats_in.append({
-            "id":        NEXT_BOAT_ID,
-            "name":      f"{random.choice(base_names)} {random.randint(10,999)} (InZone)",
-            "lat":       round(lat, 6),
-            "lng":       round(lng, 6),
+    # ---- pick candidate positions ------------------------------------------
+    if buf_valid:
+        inside_pts, outside_pts = _sample_positions_vectorized(
+            inside_target, outside_target, code
+        )
+    else:
+        # No usable geometry – keep the old unchecked sampling.
+        inside_pts  = _random_positions(cfg, inside_target)
+        outside_pts = _random_positions(cfg, outside_target)
+
+    # ---- draw names / hull numbers / valve states in bulk ------------------
+    total = len(inside_pts) + len(outside_pts)
+    if GEOPANDAS_AVAILABLE:
+        names  = _RNG.choice(base_names, size=total).tolist()
+        nums   = _RNG.integers(10, 1000, size=total).tolist()
+        valves = _RNG.integers(0, 2, size=len(outside_pts)).astype(bool).tolist()
+    else:
+        names  = [random.choice(base_names) for _ in range(total)]
+        nums   = [random.randint(10, 999)   for _ in range(total)]
+        valves = [random.choice([True, False]) for _ in range(len(outside_pts))]
+
+    # ---- inside‑buffer boats (valve CLOSED) --------------------------------
+    boats = []
+    k = len(inside_pts)
+    for (lat, lng), name, num in zip(inside_pts, names[:k], nums[:k]):
+        boat = {
+            "id":        next(_ID_ITER),
+            "name":      f"{name} {num} (InZone)",
+            "lat":       lat,
+            "lng":       lng,
             "valveOpen": False,           # <-- closed in buffer
             "country":   code
-        })
-        NEXT_BOAT_ID += 1
-
-    # ---- create outside‑buffer boats (valve random) ------------------------
-    attempts = 0
-    while len(boats_out) < outside_target and attempts < outside_target * 500:
-        attempts += 1
-        box = random.choice(cfg["sea_boxes"])
-        lat = random.uniform(box["min_lat"], box["max_lat"])
-        lng = random.uniform(box["min_lng"], box["max_lng"])
-
-        if buf_valid  and is_in_zone(lat, lng, buf_geom):   continue
-        if land_valid and is_on_land(lat, lng, land_geom):  continue
-
-        boats_out.append({
-            "id":        NEXT_BOAT_ID,
-            "name":      f"{random.choice(base_names)} {random.randint(10,999)}",
-            "lat":       round(lat, 6),
-            "lng":       round(lng, 6),
-            "valveOpen": random.choice([True, False]),
+        }
+        boats.append(boat)
+        APP_DATA["boat_index"][boat["id"]] = (code, boat)
+
+    # ---- outside‑buffer boats (valve random) -------------------------------
+    for (lat, lng), name, num, valve in zip(outside_pts, names[k:], nums[k:],
+                                            valves):
+        boat = {
+            "id":        next(_ID_ITER),
+            "name":      f"{name} {num}",
+            "lat":       lat,
+            "lng":       lng,
+            "valveOpen": valve,
             "country":   code
-        })
-        NEXT_BOAT_ID += 1
+        }
+        boats.append(boat)
+        APP_DATA["boat_index"][boat["id"]] = (code, boat)
 
-    boats = boats_in + boats_out
     random.shuffle(boats)
     return boats
 
+def _boats_cache_path(code):
+    return os.path.join(get_country_folder(code), f"boats_{code}.pkl")
+
+def _persist_boats(code, boats):
+    """Best-effort pickle of the boat list so restarts skip generation."""
+    try:
+        with open(_boats_cache_path(code), "wb") as fh:
+            pickle.dump(boats, fh)
+    except OSError as e:
+        print(f"[WARN] Could not write boat cache for {code}: {e}")
+
+def load_or_generate_boats(code):
+    """
+    Boat list for `code`: from APP_DATA if present, else from the pickle
+    sidecar when it is newer than the shapefiles, else freshly generated
+    (and persisted).  Returns None when the geometries are unavailable.
+    """
+    global _ID_ITER
+
+    if code in APP_DATA["boats"]:
+        return APP_DATA["boats"][code]
+
+    buf_geom  = get_buffer_geometry(code)
+    land_geom = get_land_geometry(code)
+    if buf_geom.is_empty or land_geom.is_empty:
+        return None
+
+    cfg        = COUNTRY_CONFIG[code]
+    folder     = get_country_folder(code)
+    cache_path = _boats_cache_path(code)
+    shp_mtimes = [os.path.getmtime(os.path.join(folder, cfg[key]))
+                  for key in ("buffer_shp", "simplified_land_shp")
+                  if os.path.exists(os.path.join(folder, cfg[key]))]
+
+    boats = None
+    if (os.path.exists(cache_path) and shp_mtimes
+            and os.path.getmtime(cache_path) >= max(shp_mtimes)):
+        try:
+            with open(cache_path, "rb") as fh:
+                boats = pickle.load(fh)
+        except Exception as e:
+            print(f"[WARN] Ignoring stale boat cache for {code}: {e}")
+
+    if boats is None:
+        boats = generate_boats(code, NUM_BOATS_PER_COUNTRY,
+                               buf_geom, land_geom)
+        _persist_boats(code, boats)
+    else:
+        # Re-register cached boats and keep new ids unique across restarts.
+        for boat in boats:
+            APP_DATA["boat_index"][boat["id"]] = (code, boat)
+        with _STATE_LOCK:
+            _ID_ITER = count(max(next(_ID_ITER),
+                                 max(b["id"] for b in boats) + 1))
+
+    APP_DATA["boats"][code] = boats
+    return boats
+
 # ---------------------------------------------------------------------------
 # Routes
 # ---------------------------------------------------------------------------
@@ -252,76 +688,100 @@ def index():
     return render_template('index.html')
 
 
+def _build_mapdata_body(code):
+    """
+    Assemble the encoded /api/mapdata JSON body.  The geometry half of the
+    response is encoded once and cached as a raw JSON fragment, so rebuilds
+    after a boat change only re-encode the small boat list instead of
+    re-escaping the multi-KB GeoJSON strings every time.
+    """
+    # ---- make / cache boats -----------------------------------------------
+    if code not in APP_DATA["boats"] and load_or_generate_boats(code) is None:
+        APP_DATA["boats"][code] = []
+
+    static = APP_DATA["mapdata_static"].get(code)
+    if static is None:
+        get_buffer_geometry(code)      # make sure the per-country caches exist
+        get_land_geometry(code)
+
+        land_geojson   = APP_DATA["land_geojson"].get(code)
+        buffer_geojson = APP_DATA["buffer_geojson"].get(code)
+        errors = []
+
+        if GEOPANDAS_AVAILABLE and land_geojson is None:
+            errors.append("Land geometry missing or invalid.")
+        if GEOPANDAS_AVAILABLE and buffer_geojson is None:
+            errors.append("Buffer geometry missing or invalid.")
+        if GEOPANDAS_AVAILABLE and (land_geojson is None
+                                    or buffer_geojson is None):
+            errors.append("Boat generation skipped – geometry unavailable.")
+
+        static = json.dumps({
+            "land":   land_geojson,
+            "buffer": buffer_geojson,
+            "center": COUNTRY_CONFIG[code]["map_center"],
+            "zoom":   COUNTRY_CONFIG[code]["map_zoom"],
+            "errors": errors or None
+        })[1:-1]                       # stored brace-less for concatenation
+        APP_DATA["mapdata_static"][code] = static
+
+    return "{" + static + ',"boats":' + json.dumps(APP_DATA["boats"][code]) + "}"
+
+def _invalidate_mapdata_cache(code):
+    """Drop the pre-compressed response (and its ETag) after any boat change."""
+    APP_DATA["mapdata_gzip"].pop(code, None)
+
 @app.route('/api/mapdata/<country>')
 def get_map_data(country):
     """
     Returns land polygons, buffer polygons, boat list, map defaults and any
     server‑side warnings for <country>.
+
+    The encoded response is cached gzipped per country together with an
+    ETag of the body; the cache is only invalidated when the boat list
+    changes (toggle / randomise), since the geometry part is static after
+    startup.  Clients that present the current ETag get a bodyless 304.
     """
     code = country.lower()
     if code not in COUNTRY_CONFIG:
         abort(404, description=f"Unknown country '{country}'")
 
-    # ---- load geometries ---------------------------------------------------
-    buffer_geom = get_buffer_geometry(code)
-    land_geom   = get_land_geometry(code)
-
-    # ---- prepare GeoJSON for map display (safe even without GeoPandas) ----
-    land_geojson = buffer_geojson = None
-    errors = []
+    cached = APP_DATA["mapdata_gzip"].get(code)
+    if cached is None:
+        body = _build_mapdata_body(code).encode("utf-8")
+        cached = (gzip.compress(body),
+                  hashlib.blake2b(body, digest_size=16).hexdigest())
+        APP_DATA["mapdata_gzip"][code] = cached
+    gz, etag = cached
 
-    if GEOPANDAS_AVAILABLE and not land_geom.is_empty:
-        land_geojson = gpd.GeoSeries([land_geom], crs=WGS84_CRS).to_json()
-    elif GEOPANDAS_AVAILABLE:
-        errors.append("Land geometry missing or invalid.")
+    if etag in request.if_none_match:
+        return Response(status=304, headers={"ETag": etag})
 
-    if GEOPANDAS_AVAILABLE and not buffer_geom.is_empty:
-        buffer_geojson = gpd.GeoSeries([buffer_geom], crs=WGS84_CRS).to_json()
-    elif GEOPANDAS_AVAILABLE:
-        errors.append("Buffer geometry missing or invalid.")
-
-    # ---- make / cache boats -----------------------------------------------
-    if code not in APP_DATA["boats"]:
-        if not buffer_geom.is_empty and not land_geom.is_empty:
-            APP_DATA["boats"][code] = generate_boats(
-                code, NUM_BOATS_PER_COUNTRY, buffer_geom, land_geom
-            )
-        else:
-            APP_DATA["boats"][code] = []
-            errors.append("Boat generation skipped – geometry unavailable.")
-
-    return jsonify({
-        "land":   land_geojson,
-        "buffer": buffer_geojson,
-        "boats":  APP_DATA["boats"][code],
-        "center": COUNTRY_CONFIG[code]["map_center"],
-        "zoom":   COUNTRY_CONFIG[code]["map_zoom"],
-        "errors": errors or None
-    })
+    if "gzip" in request.headers.get("Accept-Encoding", "").lower():
+        return Response(gz, mimetype="application/json",
+                        headers={"Content-Encoding": "gzip",
+                                 "Vary": "Accept-Encoding",
+                                 "ETag": etag})
+    return Response(gzip.decompress(gz), mimetype="application/json",
+                    headers={"ETag": etag})
 
 
 @app.route('/api/valve/toggle/<int:boat_id>', methods=['POST'])
 def toggle_valve(boat_id):
     """Toggle a boat’s valve and add a history entry when it opens."""
-    target = None
-    code   = None
-    for c, boats in APP_DATA["boats"].items():
-        for b in boats:
-            if b["id"] == boat_id:
-                target, code = b, c
-                break
-        if target:
-            break
+    code, target = APP_DATA["boat_index"].get(boat_id, (None, None))
     if not target:
         abort(404, description=f"Boat {boat_id} not found.")
 
-    target["valveOpen"] = not target["valveOpen"]
+    with _STATE_LOCK:
+        target["valveOpen"] = not target["valveOpen"]
+        opened = target["valveOpen"]
+    _invalidate_mapdata_cache(code)
 
     # log only when valve just opened
-    if target["valveOpen"]:
-        in_zone = is_in_zone(target["lat"], target["lng"],
-                             get_buffer_geometry(code))
-        APP_DATA["history"].append({
+    if opened:
+        in_zone = is_in_zone(target["lat"], target["lng"], code)
+        APP_DATA["history"].appendleft({
             "boatId":   target["id"],
             "boatName": target["name"],
             "timestamp": datetime.now(timezone.utc).isoformat(),
@@ -342,9 +802,16 @@ def toggle_valve(boat_id):
 
 @app.route('/api/history')
 def get_history():
-    """Return history entries newest‑first."""
-    return jsonify(sorted(APP_DATA["history"],
-                          key=lambda x: x["timestamp"], reverse=True))
+    """
+    Return history entries newest‑first.  The deque is kept in that order
+    at write time (appendleft on each valve opening), so serving it is a
+    straight copy – no sort, no reversal.
+    Optional ?limit=N returns only the N most recent entries.
+    """
+    limit = request.args.get("limit", type=int)
+    if limit is not None and limit >= 0:
+        return jsonify(list(islice(APP_DATA["history"], limit)))
+    return jsonify(list(APP_DATA["history"]))
 
 
 # ---------------------------------------------------------------------------
@@ -361,7 +828,14 @@ def randomise_boats(country):
     if buf.is_empty or land.is_empty:
         abort(500, description="Required geometries missing/invalid.")
 
+    # Evict the old fleet from the id index before replacing it, otherwise
+    # retired ids keep resolving to orphaned boat dicts in toggle_valve.
+    for old in APP_DATA["boats"].get(code, []):
+        APP_DATA["boat_index"].pop(old["id"], None)
+
     APP_DATA["boats"][code] = generate_boats(code, NUM_BOATS_PER_COUNTRY, buf, land)
+    _persist_boats(code, APP_DATA["boats"][code])
+    _invalidate_mapdata_cache(code)
     return jsonify({
         "boats":   APP_DATA["boats"][code],
         "message": "Boat locations randomised."
@@ -376,11 +850,28 @@ if __name__ == '__main__':
     os.makedirs('templates', exist_ok=True)
     os.makedirs('static',    exist_ok=True)
 
-    # Pre‑load geometries (optional but speeds first request)
+    # Pre‑load geometries (optional but speeds first request).  Loads run in
+    # parallel – GDAL reads and GEOS union/simplify release the GIL – so
+    # startup costs the slowest country, not the sum of all of them.
+    # Under a forking server (gunicorn --preload), loading here also lets
+    # workers inherit the populated caches copy-on-write.
     if GEOPANDAS_AVAILABLE:
+        # One task per shapefile (buffer + land × countries), not per
+        # country, so slow buffer and land loads overlap too.
+        loaders = [(get_buffer_geometry, c) for c in COUNTRY_CONFIG] + \
+                  [(get_land_geometry, c)   for c in COUNTRY_CONFIG]
+        with ThreadPoolExecutor(max_workers=len(loaders)) as ex:
+            list(ex.map(lambda job: job[0](job[1]), loaders))
+        # Boats too – cached runs load from pickle in microseconds, so the
+        # first /api/mapdata request never pays the generation cost.
         for c in COUNTRY_CONFIG:
-            get_buffer_geometry(c)
-            get_land_geometry(c)
-
+            load_or_generate_boats(c)
+
+    # Dev server only.  In production run under a WSGI server so requests
+    # don't serialize on one thread (GEOS point checks release the GIL):
+    #
+    #     gunicorn --worker-class gevent --workers 4 \
+    #              --bind 0.0.0.0:5000 --preload app:app
+    #
     print("Starting Flask on http://127.0.0.1:5000")
     app.run(debug=True, port=5000)
@@ -1,4 +1,6 @@
+import json
 import math
+import os
 import random
 from datetime import datetime, timezone
 from flask import Flask, jsonify, request
@@ -8,7 +10,8 @@ import io # Needed for reading GeoJSON string with GeoPandas
 # Try importing geospatial libraries
 try:
     import geopandas as gpd
-    from shapely.geometry import Point, Polygon, MultiPolygon
+    import shapely.wkb
+    from shapely.geometry import Point, Polygon, MultiPolygon, mapping
     from shapely.errors import GEOSException
     GEOPANDAS_AVAILABLE = True
 except ImportError:
@@ -86,6 +89,11 @@ SIMPLIFIED_COASTLINE_GEOJSON = {
 BUFFER_GEOJSON_STRING = None
 BUFFER_GEOMETRY_WGS84 = None # Shapely geometry object for checking
 
+# Baked buffer geometry (see tools/bake_buffer.py). The coastline above is a
+# constant, so the buffer only changes when it is edited; loading the baked
+# WKB skips the reproject/buffer/dissolve pipeline at startup entirely.
+BUFFER_WKB_PATH = os.path.join(os.path.dirname(__file__), "buffer_zone.wkb")
+
 # --- Geospatial Calculation Function ---
 def calculate_buffer_zone():
     """Loads coastline, calculates buffer, stores result."""
@@ -97,6 +105,18 @@ def calculate_buffer_zone():
         return
 
     try:
+        if os.path.exists(BUFFER_WKB_PATH):
+            print("Loading pre-baked buffer zone...")
+            with open(BUFFER_WKB_PATH, 'rb') as f:
+                BUFFER_GEOMETRY_WGS84 = shapely.wkb.loads(f.read())
+            BUFFER_GEOJSON_STRING = json.dumps({
+                "type": "FeatureCollection",
+                "features": [{"type": "Feature", "properties": {},
+                              "geometry": mapping(BUFFER_GEOMETRY_WGS84)}]
+            })
+            print("Buffer zone loaded from bake.")
+            return
+
         print("Loading coastline data...")
         # Use io.StringIO to read the dictionary as if it were a file
         coastline_gdf = gpd.GeoDataFrame.from_features(SIMPLIFIED_COASTLINE_GEOJSON["features"], crs=TARGET_CRS)
@@ -121,6 +141,14 @@ def calculate_buffer_zone():
         # .iloc[0] assumes dissolve resulted in a single MultiPolygon or Polygon
         BUFFER_GEOMETRY_WGS84 = buffer_gdf_wgs84.geometry.iloc[0]
 
+        # Bake the result so the next startup (and tools/bake_buffer.py
+        # runs) can skip the calculation above.
+        try:
+            with open(BUFFER_WKB_PATH, 'wb') as f:
+                f.write(shapely.wkb.dumps(BUFFER_GEOMETRY_WGS84))
+        except OSError as e:
+            print(f"WARNING: could not write baked buffer zone: {e}")
+
         print("Buffer zone calculation complete.")
 
     except GEOSException as e:
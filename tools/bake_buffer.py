@@ -0,0 +1,50 @@
+"""
+bake_buffer.py
+-------------------------------------------------------------------
+Pre-compute the first_app buffer zone offline.
+
+The coastline in archive/first_app/app.py is a hard-coded constant, so
+its reproject -> buffer -> dissolve pipeline always produces the same
+geometry; there is no reason to re-run GEOS on every startup.  This
+script runs that pipeline once and writes the result to
+archive/first_app/buffer_zone.wkb, which the app then loads directly
+(see calculate_buffer_zone).
+
+Re-run after editing SIMPLIFIED_COASTLINE_GEOJSON:
+
+    python tools/bake_buffer.py
+"""
+
+import importlib.util
+import os
+import sys
+
+FIRST_APP_DIR = os.path.join(os.path.dirname(__file__), "..",
+                             "archive", "first_app")
+WKB_PATH = os.path.join(FIRST_APP_DIR, "buffer_zone.wkb")
+
+
+def main():
+    spec = importlib.util.spec_from_file_location(
+        "first_app", os.path.join(FIRST_APP_DIR, "app.py"))
+    first_app = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(first_app)
+
+    if not first_app.GEOPANDAS_AVAILABLE:
+        sys.exit("GeoPandas is required to bake the buffer zone.")
+
+    # Remove any stale bake so the full pipeline runs, then recompute;
+    # calculate_buffer_zone writes the fresh WKB sidecar itself.
+    if os.path.exists(WKB_PATH):
+        os.remove(WKB_PATH)
+    first_app.calculate_buffer_zone()
+
+    if os.path.exists(WKB_PATH):
+        print(f"Baked buffer zone -> {WKB_PATH} "
+              f"({os.path.getsize(WKB_PATH)} bytes)")
+    else:
+        sys.exit("Buffer calculation did not produce a baked zone.")
+
+
+if __name__ == "__main__":
+    main()
@@ -23,7 +23,13 @@ OUTPUT_HTML   = "caribbean_mpa_map.html"
 if not os.path.exists(MPA_PATH):
     sys.exit(f"❌  Shapefile not found: {MPA_PATH}")
 
-gdf = gpd.read_file(MPA_PATH)
+# pyogrio reads the shapefile columnar in C (5-20× faster than fiona's
+# per-feature iterator); fall back to the default reader if unavailable.
+try:
+    import pyogrio
+    gdf = pyogrio.read_dataframe(MPA_PATH)
+except ImportError:
+    gdf = gpd.read_file(MPA_PATH)
 
 # Set CRS if missing
 if gdf.crs is None: